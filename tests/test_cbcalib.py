@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from visionfuncs.cbcalib import find_corners_in_one_image
+from visionfuncs.cbcalib import reprojection_rms
+
+
+PATTERN_SIZE_WH = (9, 6)
+
+
+def render_chessboard(pattern_size_wh, square_px=40, margin_px=60):
+    """
+    Render a synthetic chessboard image with (nx + 1) x (ny + 1) squares
+    and return it with the ground truth inner corners (n_corners x 2)
+    in OpenCV's pixel-center coordinates
+    """
+
+    nx, ny = pattern_size_wh
+    n_sq_x, n_sq_y = nx + 1, ny + 1
+
+    h = n_sq_y * square_px + 2 * margin_px
+    w = n_sq_x * square_px + 2 * margin_px
+
+    im = np.full((h, w), 255, np.uint8)
+
+    for j in range(n_sq_y):
+        for i in range(n_sq_x):
+            if (i + j) % 2 == 0:
+                y0 = margin_px + j * square_px
+                x0 = margin_px + i * square_px
+                im[y0:y0+square_px, x0:x0+square_px] = 0
+
+    # a square edge at pixel boundary k lies at k - 0.5
+    # in pixel-center coordinates
+    xs = margin_px + square_px * np.arange(1, nx + 1) - 0.5
+    ys = margin_px + square_px * np.arange(1, ny + 1) - 0.5
+    gx, gy = np.meshgrid(xs, ys)
+    corners = np.stack([gx.ravel(), gy.ravel()], axis=1)
+
+    return im, corners
+
+
+def warp_chessboard(im, corners):
+    """
+    Apply a mild perspective distortion to the rendered chessboard
+    and its ground truth corners
+    """
+
+    h, w = im.shape
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    dst = np.float32([[30, 20], [w - 10, 40], [w - 40, h - 15], [15, h - 35]])
+    H = cv2.getPerspectiveTransform(src, dst)
+
+    im_warped = cv2.warpPerspective(im, H, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+    corners_warped = cv2.perspectiveTransform(corners.reshape(-1, 1, 2), H).reshape(-1, 2)
+
+    return im_warped, corners_warped
+
+
+def corners_rms(detected, ground_truth):
+    """
+    RMS error between detected and ground truth corners,
+    allowing the detector to report the corners in reverse order
+    """
+
+    return min(
+        reprojection_rms(detected, ground_truth),
+        reprojection_rms(detected[::-1], ground_truth)
+    )
+
+
+def detection_rms(im, ground_truth, method):
+
+    corners = find_corners_in_one_image(im, PATTERN_SIZE_WH, method=method, downscale_above=None)
+    assert corners is not None
+
+    return corners_rms(corners.astype(np.float64), ground_truth)
+
+
+@pytest.mark.parametrize('warped', [False, True])
+def test_classic_and_sb_corners_accuracy_parity(warped):
+
+    im, gt = render_chessboard(PATTERN_SIZE_WH)
+    if warped:
+        im, gt = warp_chessboard(im, gt)
+
+    im = cv2.GaussianBlur(im, (5, 5), 0)
+
+    rms_classic = detection_rms(im, gt, 'classic')
+    rms_sb = detection_rms(im, gt, 'sb')
+
+    assert rms_classic < 0.2
+    assert rms_sb < 0.2
+    assert abs(rms_classic - rms_sb) < 0.1
@@ -1,34 +1,100 @@
 """
-Vision systems calibration using a chessboard calibration object
+Vision systems calibration using a chessboard calibration object.
+
+cv2.findChessboardCorners, cv2.calibrateCamera, cv2.initUndistortRectifyMap
+and cv2.remap are parallelized internally by OpenCV if it is built
+with a parallel framework (CMake options WITH_TBB=ON or WITH_OPENMP=ON).
+The number of threads used by OpenCV can be set with configure_opencv_threads
 """
 
+import os
+import math
+import hashlib
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from functools import lru_cache
 import cv2
 import numpy as np
 from .geometry import rvec_to_rmat
 from .geometry import triangulate_points
 
 findcbc_flags = {
-    'default': cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE,
-    'at_or_fq': cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_FILTER_QUADS
+    'default': cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK,
+    'at_or_fq': cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_FILTER_QUADS,
+    'sb': cv2.CALIB_CB_ACCURACY | cv2.CALIB_CB_EXHAUSTIVE
 }
 
-def find_cbc(im, pattern_size_wh, searchwin_size=5, findcbc_flags=None):
+def configure_opencv_threads(n=None):
+    """
+    Set the number of threads used by OpenCV internally
+    (all available CPUs if n is None, sequential execution if n is 0)
+    and enable OpenCV's optimized code paths
+    """
+
+    cv2.setNumThreads(n if n is not None else cv2.getNumberOfCPUs())
+    cv2.setUseOptimized(True)
+
+
+def find_cbc(im, pattern_size_wh, searchwin_size=5, findcbc_flags=None, method='classic', downscale_above=1500):
     """
-    Find chessboard corners in the given image using OpenCV
+    Find chessboard corners in the given image using OpenCV.
+
+    method='classic' uses cv2.findChessboardCorners followed by
+    sub-pixel refinement with cv2.cornerSubPix.
+    For images with the smaller side larger than `downscale_above` pixels,
+    the detection is performed on a half-resolution image (cv2.pyrDown),
+    and the upscaled corners are then refined on the original image
+    (set downscale_above=None to always detect at full resolution).
+
+    method='sb' uses the sector-based cv2.findChessboardCornersSB,
+    which already returns sub-pixel corners, so cornerSubPix is skipped
+    (findcbc_flags defaults to findcbc_flags['sb'] in this case)
     """
 
+    if method == 'sb':
+        return _find_cbc_sb(im, pattern_size_wh, findcbc_flags)
+
+    if method != 'classic':
+        raise ValueError('Unknown chessboard corners detection method: {}'.format(method))
+
+    if downscale_above is not None and min(im.shape[:2]) > downscale_above:
+        scale = 2
+        im_detect = cv2.pyrDown(im)
+    else:
+        scale = 1
+        im_detect = im
+
     if findcbc_flags == None:
-        res = cv2.findChessboardCorners(im, pattern_size_wh)
+        res = cv2.findChessboardCorners(im_detect, pattern_size_wh)
     else:
-        res = cv2.findChessboardCorners(im, pattern_size_wh, flags=findcbc_flags)
+        res = cv2.findChessboardCorners(im_detect, pattern_size_wh, flags=findcbc_flags)
 
     found, corners = res
 
     if found:
+
+        if scale != 1:
+            corners *= scale
+
+        # the search window grows with the scale to contain the
+        # true corner despite the low-resolution quantization
+        win = searchwin_size * scale
+
         term = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 30, 0.1)
-        cv2.cornerSubPix(im, corners, (searchwin_size, searchwin_size), (-1, -1), term)
+        cv2.cornerSubPix(im, corners, (win, win), (-1, -1), term)
 
-    return res
+    return found, corners
+
+
+def _find_cbc_sb(im, pattern_size_wh, flags=None):
+
+    if flags is None:
+        flags = findcbc_flags['sb']
+
+    return cv2.findChessboardCornersSB(im, pattern_size_wh, flags=flags)
 
 
 def cbc_opencv_to_numpy(success, cbc_res):
@@ -44,65 +110,359 @@ def cbc_opencv_to_numpy(success, cbc_res):
         return None
 
 
-def find_corners_in_one_image(im, pattern_size_wh, searchwin_size=5, findcbc_flags=None):
+def find_corners_in_one_image(im, pattern_size_wh, searchwin_size=5, findcbc_flags=None, method='classic', downscale_above=1500):
 
-    found, corners = find_cbc(im, pattern_size_wh, searchwin_size, findcbc_flags)
+    found, corners = find_cbc(im, pattern_size_wh, searchwin_size, findcbc_flags, method, downscale_above)
     return cbc_opencv_to_numpy(found, corners)
 
 
-def prepare_corners(images, pattern_size_wh, searchwin_size=5, findcbc_flags=None):
+def prepare_corners(images, pattern_size_wh, searchwin_size=5, findcbc_flags=None, n_jobs=1, method='classic', cache_dir=None, downscale_above=1500):
     """
     Find chessboard corners in the supplied images.
 
     Returns `corners_list`, a list containing NumPy arrays (n_corners x 2) for images with successful
-    corners detection and None for the unsuccessful ones
+    corners detection and None for the unsuccessful ones.
+
+    If n_jobs > 1, the images are processed in a pool of n_jobs processes
+    (n_jobs=-1 uses all available CPUs).
+
+    `method` and `downscale_above` control the detection (see find_cbc).
+    Color (BGR) images are converted to grayscale before the detection.
+
+    If `cache_dir` is given, the detection results are cached
+    on disk (see prepare_corners_cached)
+    """
+
+    if cache_dir is not None:
+        return prepare_corners_cached(images, pattern_size_wh, cache_dir, searchwin_size, findcbc_flags, n_jobs, method, downscale_above)
+
+    find_func = _make_find_func(pattern_size_wh, searchwin_size, findcbc_flags, method, downscale_above)
+
+    corners_list, = _find_corners_all(find_func, [images], n_jobs)
+    return corners_list
+
+
+def prepare_corners_cached(images, pattern_size_wh, cache_dir, searchwin_size=5, findcbc_flags=None, n_jobs=1, method='classic', downscale_above=1500):
     """
+    Find chessboard corners in the supplied images,
+    reusing the results cached in the `cache_dir` directory.
+
+    Each image's result is stored in a separate .npz file, keyed by
+    a hash of the image data and the detection parameters.
+    Corners are detected (as in prepare_corners) only for the images
+    without a cached result, and the new results are added to the cache
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    images = list(images)
+    params = (searchwin_size, findcbc_flags, method, downscale_above)
+    paths = [_corners_cache_path(cache_dir, im, pattern_size_wh, params) for im in images]
 
-    corners_list = []
+    corners_list = [None] * len(images)
+    missing = []
 
-    for i, im in enumerate(images):
+    for i, path in enumerate(paths):
+        hit, corners = _load_cached_corners(path)
+        if hit:
+            corners_list[i] = corners
+        else:
+            missing.append(i)
 
-        res = find_corners_in_one_image(im, pattern_size_wh, searchwin_size, findcbc_flags)
-        corners_list.append(res)
+    if len(missing) > 0:
+
+        detected = prepare_corners(
+            [images[i] for i in missing],
+            pattern_size_wh,
+            searchwin_size,
+            findcbc_flags,
+            n_jobs,
+            method,
+            downscale_above=downscale_above
+        )
+
+        for i, corners in zip(missing, detected):
+            _save_cached_corners(paths[i], corners)
+            corners_list[i] = corners
 
     return corners_list
 
 
-def prepare_corners_stereo(images1, images2, pattern_size_wh, searchwin_size=5, findcbc_flags=None):
+def _corners_cache_path(cache_dir, im, pattern_size_wh, params):
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(im).tobytes())
+    h.update(repr((im.shape, im.dtype.str, params)).encode())
+
+    pw, ph = pattern_size_wh
+    fname = '{}_{}x{}.npz'.format(h.hexdigest(), pw, ph)
+
+    return os.path.join(cache_dir, fname)
+
+
+def _load_cached_corners(path):
+    """
+    Load cached detection result.
+    Returns a tuple (hit, corners), with hit being False
+    if the file is missing or cannot be read
+    """
+
+    try:
+        with np.load(path) as data:
+            if not data['found']:
+                return True, None
+            return True, data['corners']
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return False, None
+
+
+def _save_cached_corners(path, corners):
+    """
+    Save detection result to a temporary file in the cache directory
+    and atomically move it into place, so that an interrupted run
+    or a concurrent process never leaves a partially written file
+    """
+
+    if corners is None:
+        found, corners = False, np.empty((0, 2), np.float32)
+    else:
+        found = True
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, found=found, corners=corners)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def prepare_corners_stereo(images1, images2, pattern_size_wh, searchwin_size=5, findcbc_flags=None, n_jobs=1, method='classic', return_indices=False, downscale_above=1500):
+    """
+    Find chessboard corners in the supplied stereo image pairs
+    and keep only the pairs with successful detection in both images.
+
+    Returns (corners1, corners2, num_images), and additionally
+    the indices of the kept pairs if return_indices is True.
+
+    The other arguments are the same as in prepare_corners
+    """
 
-    corners1 = prepare_corners(images1, pattern_size_wh, searchwin_size, findcbc_flags)
-    corners2 = prepare_corners(images2, pattern_size_wh, searchwin_size, findcbc_flags)
+    find_func = _make_find_func(pattern_size_wh, searchwin_size, findcbc_flags, method, downscale_above)
 
-    res1 = []
-    res2 = []
-    for c1, c2 in zip(corners1, corners2):
-        if not ((c1 is None) or (c2 is None)):
-            res1.append(c1)
-            res2.append(c2)
+    corners1, corners2 = _find_corners_all(find_func, [images1, images2], n_jobs)
 
+    res1, res2, indices = filter_corners_stereo(corners1, corners2)
     num_images = len(res1)
 
+    if return_indices:
+        return res1, res2, num_images, indices
+
     return res1, res2, num_images
 
 
-def calibrate_camera(im_wh, object_points, image_points):
+def prepare_corners_stereo_fused(images1, images2, pattern_size_wh, searchwin_size=5, findcbc_flags=None, n_jobs=1, method='classic', return_indices=False, downscale_above=1500):
+    """
+    Find chessboard corners in the supplied stereo image pairs
+    processing each pair in one pass: detection in the second image
+    is skipped if it fails in the first one.
+
+    Arguments and return values are the same as in prepare_corners_stereo
+    """
+
+    find_func = _make_find_func(pattern_size_wh, searchwin_size, findcbc_flags, method, downscale_above)
+    find_pair_func = partial(_find_corners_in_pair, find_func=find_func)
+
+    pair_results, = _find_corners_all(find_pair_func, [list(zip(images1, images2))], n_jobs)
+
+    corners1 = [c1 for c1, _ in pair_results]
+    corners2 = [c2 for _, c2 in pair_results]
+
+    res1, res2, indices = filter_corners_stereo(corners1, corners2)
+    num_images = len(res1)
+
+    if return_indices:
+        return res1, res2, num_images, indices
+
+    return res1, res2, num_images
+
+
+def _find_corners_in_pair(pair, find_func, scratch=None):
+
+    im1, im2 = pair
+
+    c1 = find_func(im1, scratch=scratch)
+    if c1 is None:
+        return None, None
+
+    c2 = find_func(im2, scratch=scratch)
+    return c1, c2
+
+
+def filter_corners_stereo(corners1, corners2):
+    """
+    Given lists of chessboard corners for the left and right images
+    (with None for unsuccessful detections), return the corners
+    of the pairs detected in both images, along with
+    the indices of those pairs
+    """
+
+    indices = _stereo_indices(corners1, corners2)
+
+    res1 = [corners1[i] for i in indices]
+    res2 = [corners2[i] for i in indices]
+
+    return res1, res2, indices
+
+
+def _stereo_indices(corners1, corners2):
+    return [i for i, (c1, c2) in enumerate(zip(corners1, corners2)) if c1 is not None and c2 is not None]
+
+
+def _resolve_n_jobs(n_jobs):
+
+    if n_jobs is None or n_jobs == 0:
+        return 1
+
+    if n_jobs < 0:
+        return os.cpu_count() or 1
+
+    return n_jobs
+
+
+def _chunksize(n_items, n_workers):
+    return max(1, n_items // (4 * n_workers))
+
+
+def _make_find_func(pattern_size_wh, searchwin_size, findcbc_flags, method, downscale_above):
+    """
+    Create a picklable function detecting chessboard corners
+    in one image (color images are converted to grayscale)
+    with the given detection parameters
+    """
+
+    find_func = partial(
+        find_corners_in_one_image,
+        pattern_size_wh=pattern_size_wh,
+        searchwin_size=searchwin_size,
+        findcbc_flags=findcbc_flags,
+        method=method,
+        downscale_above=downscale_above
+    )
+
+    return partial(_find_corners_in_gray, find_func=find_func)
+
+
+def _find_corners_all(find_func, item_lists, n_jobs):
+    """
+    Apply find_func to each item of each list in item_lists,
+    serially or in a process pool shared by all the lists.
+
+    Returns a list of results lists
+    """
+
+    n_workers = _resolve_n_jobs(n_jobs)
+
+    if n_workers == 1:
+        return [_find_corners_serial(find_func, items) for items in item_lists]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # map calls submit their tasks eagerly, so all
+        # the lists are processed concurrently
+        res_iterators = [_map_corners(executor, find_func, items, n_workers) for items in item_lists]
+        return [list(res_it) for res_it in res_iterators]
+
+
+def _map_corners(executor, find_func, items, n_workers):
+
+    items = list(items)
+    return executor.map(find_func, items, chunksize=_chunksize(len(items), n_workers))
+
+
+def _find_corners_serial(find_func, items):
+    """
+    Apply find_func to each item, with color images converted
+    to grayscale in scratch buffers reused across the items
+    """
+
+    scratch = {}
+    return [find_func(item, scratch=scratch) for item in items]
+
+
+def _find_corners_in_gray(im, find_func, scratch=None):
+
+    return find_func(_to_gray(im, scratch))
+
+
+def _to_gray(im, scratch=None):
+    """
+    Convert a color (BGR or BGRA) image to grayscale.
+    Single-channel images are returned unchanged.
+
+    If a dictionary `scratch` is supplied, the result is written
+    to a buffer stored in it and reused for images of the same size
+    """
+
+    if not (im.ndim == 3 and im.shape[2] in (3, 4)):
+        return im
+
+    if scratch is None:
+        return cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+
+    key = (im.shape[:2], im.dtype.str)
+    if key not in scratch:
+        scratch[key] = np.empty(im.shape[:2], im.dtype)
+
+    return cv2.cvtColor(im, cv2.COLOR_BGR2GRAY, dst=scratch[key])
+
+
+def calibrate_camera(im_wh, object_points, image_points, flags=cv2.CALIB_USE_LU):
     """
     Perform camera calibration using a set of images with the chessboard pattern
 
     image_points -- a list of chessboard corners shaped as NumPy arrays (n_points x 2)
+    flags -- flags passed to cv2.calibrateCamera (by default, the faster
+             LU decomposition is used instead of SVD; pass 0 for the OpenCV default)
 
     Returns a tuple as a result of the cv2.calibrateCamera function call,
     containing the following calibration results:
     rms, camera_matrix, dist_coefs, rvecs, tvecs
     """
 
-    res = cv2.calibrateCamera(object_points, image_points, im_wh, None, None)
+    res = cv2.calibrateCamera(object_points, image_points, im_wh, None, None, flags=flags)
     return res
 
 
-def calibrate_stereo(object_points, impoints_1, impoints_2, cm_1, dc_1, cm_2, dc_2, im_wh):
+def calibrate_both(im_wh, object_points, impoints_1, impoints_2, flags=cv2.CALIB_USE_LU):
+    """
+    Perform intrinsic calibration of both cameras of a stereo rig.
+    The two independent cv2.calibrateCamera calls run concurrently
+    in two threads (OpenCV releases the GIL during the optimization).
+
+    Returns a tuple of two results of calibrate_camera
+    """
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_1 = executor.submit(calibrate_camera, im_wh, object_points, impoints_1, flags)
+        future_2 = executor.submit(calibrate_camera, im_wh, object_points, impoints_2, flags)
+        return future_1.result(), future_2.result()
+
+
+def calibrate_stereo(object_points, impoints_1, impoints_2, cm_1, dc_1, cm_2, dc_2, im_wh,
+                     flags=cv2.CALIB_FIX_INTRINSIC | cv2.CALIB_USE_LU):
+    """
+    Perform stereo calibration with cv2.stereoCalibrate.
+
+    With the default flags, the already known intrinsics (cm_1, dc_1, cm_2, dc_2)
+    are kept fixed, so only the extrinsics are estimated,
+    and LU decomposition is used instead of SVD.
+
+    Returns R, T, E, F
+    """
 
-    res = cv2.stereoCalibrate(object_points, impoints_1, impoints_2, cm_1, dc_1, cm_2, dc_2, im_wh)
+    res = cv2.stereoCalibrate(object_points, impoints_1, impoints_2, cm_1, dc_1, cm_2, dc_2, im_wh, flags=flags)
 
     R, T, E, F = res[-4:]
 
@@ -119,17 +479,33 @@ def prepare_object_points(num_images, pattern_size_wh, square_size):
 
 
 def make_list_of_identical_pattern_points(num_images, pattern_points):
-    return [pattern_points for i in range(num_images)]
+    return [pattern_points] * num_images
 
 
 def get_pattern_points(pattern_size_wh, square_size):
     """
-    Form a matrix with object points for a chessboard calibration object
+    Form a matrix with object points for a chessboard calibration object.
+
+    The result is cached per (pattern_size_wh, square_size) and
+    the same read-only array is returned on repeated calls
+    (copy it if it needs to be modified)
     """
 
-    pattern_points = np.zeros((np.prod(pattern_size_wh), 3), np.float32)
-    pattern_points[:, :2] = np.indices(pattern_size_wh).T.reshape(-1, 2)
-    pattern_points *= square_size
+    return _get_pattern_points_cached(tuple(pattern_size_wh), square_size)
+
+
+@lru_cache(maxsize=32)
+def _get_pattern_points_cached(pattern_size_wh, square_size):
+
+    w, h = pattern_size_wh
+
+    # x varies fastest, matching the order of detected corners
+    ys, xs = np.mgrid[0:h, 0:w].astype(np.float32) * np.float32(square_size)
+    zs = np.zeros(w * h, np.float32)
+
+    pattern_points = np.stack([xs.ravel(), ys.ravel(), zs], axis=1)
+    pattern_points.flags.writeable = False
+
     return pattern_points
 
 
@@ -143,36 +519,152 @@ def solve_pnp_ransac(pattern_points, image_points, cam_matrix, dist_coefs,
 def project_points(object_points, rvec, tvec, cm, dc):
     """
     Project points using cv2.projectPoints
-    and reshape the result to (n_points, 2)
+    and reshape the result to (n_points, 2).
+
+    If there is no distortion (dc is None or all zeros),
+    the pinhole projection is computed directly with NumPy
     """
 
+    if dc is None or not np.any(dc):
+        return _project_points_pinhole(object_points, rvec, tvec, cm)
+
     projected, _ = cv2.projectPoints(object_points, rvec, tvec, cm, dc)
     return projected.reshape(-1, 2)
 
 
-def reprojection_rms(impoints_known, impoints_reprojected):
+def _project_points_pinhole(object_points, rvec, tvec, cm):
+
+    R = rvec if np.shape(rvec) == (3, 3) else rvec_to_rmat(rvec)
+
+    Xc = np.reshape(object_points, (-1, 3)) @ R.T + np.reshape(tvec, (1, 3))
+
+    # as in cv2.projectPoints, 1/Z is replaced by 1 for points with Z = 0
+    z = Xc[:, 2:3]
+    z_inv = np.ones_like(z)
+    np.divide(1.0, z, out=z_inv, where=(z != 0))
+    xp = Xc[:, :2] * z_inv
+
+    # as in cv2.projectPoints, the skew term cm[0, 1] is ignored
+    fx, fy = cm[0, 0], cm[1, 1]
+    cx, cy = cm[0, 2], cm[1, 2]
+
+    uv = np.empty_like(xp)
+    uv[:, 0] = fx * xp[:, 0] + cx
+    uv[:, 1] = fy * xp[:, 1] + cy
+
+    # cv2.projectPoints returns points of the same depth as object_points
+    op_dtype = np.result_type(object_points)
+    if np.issubdtype(op_dtype, np.floating):
+        uv = uv.astype(op_dtype, copy=False)
+
+    return uv
+
+
+def reprojection_rms(impoints_known, impoints_reprojected, out=None):
     """
     Compute root mean square (RMS) error of points
     reprojection (cv2.projectPoints).
 
-    Both input NumPy arrays should be of shape (n_points, 2)
+    Both input NumPy arrays should be of shape (n_points, 2).
+    An optional preallocated array `out` of the same shape
+    can be supplied to hold the intermediate differences.
+
+    If Numba is available and `out` is not supplied, a JIT-compiled
+    loop without temporary arrays is used for non-empty
+    floating-point (n_points, 2) arrays
     """
 
-    diff = impoints_known - impoints_reprojected
+    a = np.asarray(impoints_known)
+    b = np.asarray(impoints_reprojected)
 
-    squared_distances = np.sum(np.square(diff), axis=1)
-    rms = np.sqrt(np.mean(squared_distances))
+    if out is None and _numba_compatible(a, b):
+        rms_nb = _get_reprojection_rms_nb()
+        if rms_nb is not None:
+            return rms_nb(a, b)
 
-    return rms
+    diff = np.subtract(a, b, out=out)
+    n = diff.shape[0]
+
+    return np.sqrt(np.einsum('ij,ij->', diff, diff) / n)
+
+
+def _numba_compatible(a, b):
 
+    return (
+        a.ndim == 2 and a.shape == b.shape and a.shape[1] == 2 and a.shape[0] > 0
+        and a.dtype.kind == 'f' and b.dtype.kind == 'f'
+    )
 
-def reproject_and_measure_error(image_points, object_points, rvecs, tvecs, cm, dc):
+
+@lru_cache(maxsize=None)
+def _get_reprojection_rms_nb():
+    """
+    Import Numba on first use and JIT-compile the RMS loop.
+    Returns None if Numba is not available
+    """
+
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    return numba.njit(cache=True, fastmath=True)(_reprojection_rms_loop)
+
+
+def _reprojection_rms_loop(a, b):
+
+    s = 0.0
+    n = a.shape[0]
+
+    for i in range(n):
+        dx = a[i, 0] - b[i, 0]
+        dy = a[i, 1] - b[i, 1]
+        s += dx * dx + dy * dy
+
+    return math.sqrt(s / n)
+
+
+def stack_corners(corners_list):
+    """
+    Stack a list of chessboard corners arrays (n_corners x 2),
+    skipping None entries, into a single float32 array
+    of shape (n_views, n_corners, 2).
+
+    If all the entries are None, an empty (0, 0, 2) array is returned
+    """
+
+    corners_present = [c for c in corners_list if c is not None]
+
+    if len(corners_present) == 0:
+        return np.empty((0, 0, 2), np.float32)
+
+    return np.stack(corners_present).astype(np.float32, copy=False)
+
+
+def reprojection_rms_batch(impoints_known, impoints_reprojected):
+    """
+    Compute RMS reprojection error for each view at once.
+
+    Both input NumPy arrays should be of shape (n_views, n_points, 2).
+    Returns an array of shape (n_views,)
+    """
+
+    diff = impoints_known - impoints_reprojected
+    n = diff.shape[1]
+
+    return np.sqrt(np.einsum('vij,vij->v', diff, diff) / n)
+
+
+def reproject_and_measure_error(image_points, object_points, rvecs, tvecs, cm, dc, per_view=False):
     """
     Given a list of image points (a NumPy array per image) and 
     a list of known object points (a NumPy array per image),
     perform reprojection for each image 
     with the known camera intrinsics (cm, dc) and extrinsics (rvecs, tvecs), 
     and measure RMS reprojection error for all points in all images. 
+
+    If per_view is True, an array with RMS error
+    for each image is returned instead.
     """
     
     reproj_list = []
@@ -181,14 +673,46 @@ def reproject_and_measure_error(image_points, object_points, rvecs, tvecs, cm, d
 
         ip_reprojected = project_points(op, rvec, tvec, cm, dc)
         reproj_list.append(ip_reprojected)
-        
+
+    original_list = list(image_points)
+
+    if _same_shapes(original_list, reproj_list):
+
+        rms_per_view = reprojection_rms_batch(np.stack(original_list), np.stack(reproj_list))
+
+        if per_view:
+            return rms_per_view
+
+        return np.sqrt(np.mean(np.square(rms_per_view)))
+
+    if per_view:
+        return np.array([reprojection_rms(ip, ip_r) for ip, ip_r in zip(original_list, reproj_list)])
+
     reproj_all = np.concatenate(reproj_list, axis=0)
-    original_all = np.concatenate(image_points, axis=0)
+    original_all = np.concatenate(original_list, axis=0)
     
     rms = reprojection_rms(original_all, reproj_all)
     return rms
 
 
+def _same_shapes(original_list, reproj_list):
+    """
+    Check whether all the views are present and
+    have the same number of points, so that they can be stacked
+    """
+
+    if len(original_list) == 0 or len(original_list) != len(reproj_list):
+        return False
+
+    shape = np.shape(reproj_list[0])
+
+    for ip, ip_r in zip(original_list, reproj_list):
+        if ip is None or np.shape(ip) != shape or np.shape(ip_r) != shape:
+            return False
+
+    return True
+
+
 def triangulate_impoints(P1, P2, impoints_1, impoints_2):
     """
     Perform triangulation of image points for 
@@ -211,19 +735,147 @@ def get_im_wh(im):
     return w, h
 
 
-def undistort_and_rectify_images_stereo(images1, images2, cm1, dc1, cm2, dc2, R1, R2, P1, P2):
+class StereoUndistortRectifier:
+    """
+    Undistortion and rectification of stereo image pairs
+    with the maps computed once (cv2.initUndistortRectifyMap)
+    and reused for every subsequent pair of images.
+
+    m1type is the type of the maps: the compact fixed-point cv2.CV_16SC2
+    (default) or float32 cv2.CV_32FC1, required for remapping on GPU
+    (see undistort_and_rectify_images_stereo_gpu)
+    """
+
+    def __init__(self, cm1, dc1, cm2, dc2, R1, R2, P1, P2, im_wh, interp_method=cv2.INTER_LINEAR, m1type=cv2.CV_16SC2):
+
+        self.maps1 = cv2.initUndistortRectifyMap(cm1, dc1, R1, P1, im_wh, m1type=m1type)
+        self.maps2 = cv2.initUndistortRectifyMap(cm2, dc2, R2, P2, im_wh, m1type=m1type)
+        self.interp_method = interp_method
+        self.m1type = m1type
+
+    def rectify_1(self, im):
+        return cv2.remap(im, self.maps1[0], self.maps1[1], self.interp_method)
+
+    def rectify_2(self, im):
+        return cv2.remap(im, self.maps2[0], self.maps2[1], self.interp_method)
+
+    def rectify_pair(self, im1, im2):
+        return self.rectify_1(im1), self.rectify_2(im2)
+
+    def __call__(self, im1, im2):
+        return self.rectify_pair(im1, im2)
+
+
+def undistort_and_rectify_images_stereo(images1, images2, cm1, dc1, cm2, dc2, R1, R2, P1, P2, n_jobs=1):
+    """
+    Undistort and rectify lists of images from a stereo rig.
+
+    If n_jobs > 1, the remapping is performed in a pool of n_jobs
+    threads (n_jobs=-1 uses all available CPUs); cv2.remap releases
+    the GIL, so the images are processed in parallel
+    """
 
     im_wh = get_im_wh(images1[0])
 
-    maps1 = cv2.initUndistortRectifyMap(cm1, dc1, R1, P1, im_wh, m1type=cv2.CV_16SC2)
-    maps2 = cv2.initUndistortRectifyMap(cm2, dc2, R2, P2, im_wh, m1type=cv2.CV_16SC2)
+    rectifier = StereoUndistortRectifier(cm1, dc1, cm2, dc2, R1, R2, P1, P2, im_wh)
 
-    interp_method = cv2.INTER_LINEAR
+    n_workers = _resolve_n_jobs(n_jobs)
 
-    images1_rect = [cv2.remap(im, maps1[0], maps1[1], interp_method) for im in images1]
-    images2_rect = [cv2.remap(im, maps2[0], maps2[1], interp_method) for im in images2]
+    if n_workers == 1:
+        images1_rect = [rectifier.rectify_1(im) for im in images1]
+        images2_rect = [rectifier.rectify_2(im) for im in images2]
+    else:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            res_it1 = executor.map(rectifier.rectify_1, images1)
+            res_it2 = executor.map(rectifier.rectify_2, images2)
+            images1_rect = list(res_it1)
+            images2_rect = list(res_it2)
+
+    return images1_rect, images2_rect, rectifier.maps1, rectifier.maps2
 
-    return images1_rect, images2_rect, maps1, maps2
+
+def undistort_and_rectify_images_stereo_gpu(images1, images2, cm1, dc1, cm2, dc2, R1, R2, P1, P2, rectifier=None):
+    """
+    Undistort and rectify lists of images from a stereo rig
+    with the remapping performed on GPU.
+
+    The CUDA module (cv2.cuda) is used if OpenCV is built with it
+    and a CUDA device is available; otherwise the transparent API
+    (cv2.UMat, dispatching to OpenCL when available) is used.
+    The rectification maps are uploaded to the device once per call,
+    and the images are then uploaded, remapped and downloaded one by one.
+
+    A StereoUndistortRectifier created with m1type=cv2.CV_32FC1 can be
+    supplied to reuse its maps across calls (all images must match
+    its image size); otherwise one is created.
+    Unlike undistort_and_rectify_images_stereo, the returned maps
+    are float32 (cv2.CV_32FC1), as required by cv2.cuda.remap
+    """
+
+    if rectifier is None:
+        im_wh = get_im_wh(images1[0])
+        rectifier = StereoUndistortRectifier(cm1, dc1, cm2, dc2, R1, R2, P1, P2, im_wh, m1type=cv2.CV_32FC1)
+    elif rectifier.m1type != cv2.CV_32FC1:
+        raise ValueError('GPU remapping requires a rectifier with float32 maps (m1type=cv2.CV_32FC1)')
+
+    _check_images_match_maps(images1, rectifier.maps1)
+    _check_images_match_maps(images2, rectifier.maps2)
+
+    if _cuda_available():
+        remap_func = _remap_images_cuda
+    else:
+        remap_func = _remap_images_umat
+
+    images1_rect = remap_func(images1, rectifier.maps1, rectifier.interp_method)
+    images2_rect = remap_func(images2, rectifier.maps2, rectifier.interp_method)
+
+    return images1_rect, images2_rect, rectifier.maps1, rectifier.maps2
+
+
+def _cuda_available():
+
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+def _remap_images_cuda(images, maps, interp_method=cv2.INTER_LINEAR):
+    """
+    Remap images with cv2.cuda.remap, reusing the device buffers
+    for the source and destination images
+    """
+
+    map_x, map_y = cv2.cuda_GpuMat(), cv2.cuda_GpuMat()
+    map_x.upload(maps[0])
+    map_y.upload(maps[1])
+
+    src, dst = cv2.cuda_GpuMat(), cv2.cuda_GpuMat()
+
+    res = []
+    for im in images:
+        src.upload(im)
+        dst = cv2.cuda.remap(src, map_x, map_y, interp_method, dst=dst)
+        res.append(dst.download())
+
+    return res
+
+
+def _check_images_match_maps(images, maps):
+
+    map_wh = get_im_wh(maps[0])
+
+    for im in images:
+        if get_im_wh(im) != map_wh:
+            raise ValueError('Image size {} does not match the rectification maps size {}'.format(get_im_wh(im), map_wh))
+
+
+def _remap_images_umat(images, maps, interp_method=cv2.INTER_LINEAR):
+
+    map_x = cv2.UMat(maps[0])
+    map_y = cv2.UMat(maps[1])
+
+    return [cv2.remap(cv2.UMat(im), map_x, map_y, interp_method).get() for im in images]
 
 
 def undistort_points(points, cm, dc, P_mat=None, R_mat=None):
@@ -247,17 +899,7 @@ def prepare_indices_stereocalib(corners1, corners2):
     nor in corners2 there is None at those indices).
     """
 
-    indices = []
-
-    idx = 0
-    for c1, c2 in zip(corners1, corners2):
-        
-        if not ((c1 is None) or (c2 is None)):
-            indices.append(idx)
-        
-        idx += 1
-
-    return indices
+    return _stereo_indices(corners1, corners2)
 
 
 def cb_row(corners, pattern_size_wh, row_idx):